@@ -0,0 +1,143 @@
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+DEFAULT_ADMISSION = {
+    'BACKEND': 'quiz.admission.LocalAdmissionQueue',
+    'RATE': 20,
+    'BURST': 50,
+    'WINDOW': 900,
+}
+
+# Seconds a cache lock is held at most, and seconds a request waits for it before backing off
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 2
+
+
+class AdmissionBusy(Exception):
+    pass
+
+
+@dataclass
+class Admission:
+    admitted: bool
+    position: int | None = 0
+    retry_after: int = 0
+
+
+class BaseAdmissionQueue:
+    """
+    Per-quiz token bucket with a FIFO waiting room.
+
+    Time is counted in slots of 1 / RATE seconds. Every submission is given the
+    next free slot once, and is admitted when that slot is reached. Idle time
+    refills the bucket, but never by more than BURST slots, so early callers
+    cannot open the gate for the rush that follows.
+    """
+
+    def __init__(self, rate, burst, window):
+        self.rate = rate
+        self.burst = burst
+        self.window = window
+
+    def current_slot(self, now):
+        return math.floor(now * self.rate)
+
+    def next_slot(self, last_slot, now):
+        floor = self.current_slot(now) - self.burst
+        return max(floor, floor if last_slot is None else last_slot) + 1
+
+    def draw(self, quiz_id, submission_id, now):
+        # Return the slot given to the submission, drawing one on its first call
+        raise NotImplementedError
+
+    def admit(self, quiz_id, submission_id):
+        now = time.time()
+        try:
+            slot = self.draw(str(quiz_id), str(submission_id), now)
+        except AdmissionBusy:
+            # The queue could not be reached in time, ask the client to retry without a position
+            return Admission(admitted=False, position=None, retry_after=1)
+        position = slot - self.current_slot(now)
+        if position <= 0:
+            return Admission(admitted=True)
+
+        return Admission(
+            admitted=False,
+            position=position,
+            retry_after=max(1, math.ceil(slot / self.rate - now)),
+        )
+
+
+class LocalAdmissionQueue(BaseAdmissionQueue):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def draw(self, quiz_id, submission_id, now):
+        with self._lock:
+            # Drop every quiz whose last slot was reached more than WINDOW seconds ago
+            expired = self.current_slot(now - self.window)
+            self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket['last_slot'] >= expired}
+
+            bucket = self._buckets.get(quiz_id)
+            if bucket is None:
+                bucket = self._buckets[quiz_id] = {'last_slot': None, 'slots': {}}
+
+            slot = bucket['slots'].get(submission_id)
+            if slot is None:
+                slot = bucket['last_slot'] = self.next_slot(bucket['last_slot'], now)
+                bucket['slots'][submission_id] = slot
+            return slot
+
+
+class CacheAdmissionQueue(BaseAdmissionQueue):
+    # Relies on atomic add(), so the cache must be shared between workers (Redis, Memcached)
+
+    @contextmanager
+    def lock(self, key):
+        token = uuid.uuid4().hex
+        delay = 0.001
+        deadline = time.monotonic() + LOCK_WAIT
+        while not cache.add(key, token, LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise AdmissionBusy
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            # The lock may have expired and been taken by another worker, only release our own
+            if cache.get(key) == token:
+                cache.delete(key)
+
+    def draw(self, quiz_id, submission_id, now):
+        last_key = f'quiz:{quiz_id}:admission:last_slot'
+        slot_key = f'quiz:{quiz_id}:admission:slot:{submission_id}'
+
+        slot = cache.get(slot_key)
+        if slot is None:
+            with self.lock(f'quiz:{quiz_id}:admission:lock'):
+                slot = cache.get(slot_key)
+                if slot is None:
+                    slot = self.next_slot(cache.get(last_key), now)
+                    # Keep the slots until WINDOW seconds after they are reached
+                    timeout = max(0, slot / self.rate - now) + self.window
+                    cache.set(last_key, slot, timeout)
+                    cache.set(slot_key, slot, timeout)
+        return slot
+
+
+@lru_cache(maxsize=None)
+def get_admission_queue():
+    config = {**DEFAULT_ADMISSION, **getattr(settings, 'QUIZ_ADMISSION', {})}
+    backend = import_string(config['BACKEND'])
+    return backend(rate=config['RATE'], burst=config['BURST'], window=config['WINDOW'])
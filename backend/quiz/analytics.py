@@ -0,0 +1,163 @@
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count, Max
+from .models import Answer, Choice, Question, Quiz, QuizSubmission
+from .sampling import draw_paper, paper_key
+
+# Share of examinees in the upper and lower groups for distractor analysis
+GROUP_FRACTION = 0.27
+
+ANALYSIS_TIMEOUT = 60 * 60
+
+
+def _number(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / denominator
+
+
+def _correlate(x, y, mask):
+    # Column-wise Pearson correlation of two (submissions x items) matrices over the masked cells
+    x = np.where(mask, x, 0)
+    y = np.where(mask, y, 0)
+    n = mask.sum(axis=0)
+    xc = np.where(mask, x - _ratio(x.sum(axis=0), n), 0)
+    yc = np.where(mask, y - _ratio(y.sum(axis=0), n), 0)
+    return _ratio((xc * yc).sum(axis=0), np.sqrt((xc ** 2).sum(axis=0) * (yc ** 2).sum(axis=0)))
+
+
+def presented_questions(quiz, submission_ids, question_index):
+    """
+    Return a submissions x questions mask of the MCQ questions on each paper.
+
+    Papers still in the cache are used as they were shown. Older papers are
+    drawn again from the frozen bank size and sample size, and a question
+    deleted since then is replaced by one the participant never saw. Answered
+    questions are always marked as presented by the caller.
+    """
+    presented = np.zeros((len(submission_ids), len(question_index)), dtype=bool)
+    draws = {pk: (bank_size, sample_size) for pk, bank_size, sample_size in QuizSubmission.objects.filter(id__in=submission_ids).values_list('id', 'bank_size', 'sample_size')}
+    if not quiz.sample_size and not any(sample_size for _, sample_size in draws.values()):
+        presented[:] = True
+        return presented
+
+    papers = cache.get_many([paper_key(pk) for pk in submission_ids])
+    ordinals = None
+
+    def lookup(batch):
+        return {ordinal: ordinals[ordinal] for ordinal in batch if ordinal in ordinals}
+
+    for row, submission_id in enumerate(submission_ids):
+        paper = papers.get(paper_key(submission_id))
+        if paper is None:
+            bank_size, sample_size = draws[submission_id]
+            if bank_size is None:
+                bank_size, sample_size = quiz.next_ordinal, quiz.sample_size
+            if not sample_size:
+                presented[row] = True
+                continue
+            if ordinals is None:
+                ordinals = dict(Question.objects.filter(quiz=quiz).values_list('ordinal', 'id'))
+            paper = draw_paper(submission_id.int, bank_size, sample_size, lookup, lambda: ordinals)
+        presented[row, [question_index[pk] for pk in paper if pk in question_index]] = True
+    return presented
+
+
+def build_response_matrix(quiz):
+    """
+    Load a quiz's MCQ answers into a submissions x questions 0/1 score matrix,
+    the matching mask of presented questions and a submissions x choices
+    selection matrix.
+    """
+    questions = list(Question.objects.filter(quiz=quiz, type='mcq').order_by('ordinal').values('id', 'content', 'correct_choice'))
+    choices = list(Choice.objects.filter(question__quiz=quiz, question__type='mcq').order_by('question', 'id').values('id', 'question', 'content'))
+    answers = np.array(
+        Answer.objects.filter(submission__quiz=quiz, question__type='mcq').values_list('submission', 'question', 'choice', 'is_correct'),
+        dtype=object,
+    ).reshape(-1, 4)
+
+    submission_ids = list(dict.fromkeys(answers[:, 0]))
+    submission_index = {pk: i for i, pk in enumerate(submission_ids)}
+    question_index = {question['id']: i for i, question in enumerate(questions)}
+    choice_index = {choice['id']: i for i, choice in enumerate(choices)}
+    rows = [submission_index[pk] for pk in answers[:, 0]]
+
+    scores = np.zeros((len(submission_ids), len(questions)))
+    scores[rows, [question_index[pk] for pk in answers[:, 1]]] = answers[:, 3].astype(bool)
+
+    presented = presented_questions(quiz, submission_ids, question_index)
+    presented[rows, [question_index[pk] for pk in answers[:, 1]]] = True
+
+    selections = np.zeros((len(submission_ids), len(choices)))
+    selections[rows, [choice_index[pk] for pk in answers[:, 2]]] = 1
+
+    return questions, choices, scores, presented, selections
+
+
+def analyze_quiz(quiz):
+    questions, choices, scores, presented, selections = build_response_matrix(quiz)
+    n_submissions, n_items = scores.shape
+
+    totals = scores.sum(axis=1)
+    shown = presented.sum(axis=1)
+    difficulty = _ratio(scores.sum(axis=0), presented.sum(axis=0))
+
+    # Corrected point-biserial: each item against the share correct on the other items the participant was shown
+    rest = _ratio(totals[:, None] - scores, shown[:, None] - 1)
+    discrimination = _correlate(scores, rest, presented & (shown[:, None] > 1))
+
+    # KR-20 assumes a single form, it is undefined when participants were shown different questions
+    variance = totals.var() if n_submissions else 0
+    if presented.all() and n_items > 1 and variance > 0:
+        kr20 = n_items / (n_items - 1) * (1 - (difficulty * (1 - difficulty)).sum() / variance)
+    else:
+        kr20 = np.nan
+
+    group_size = max(1, int(round(n_submissions * GROUP_FRACTION)))
+    ranking = np.argsort(np.nan_to_num(_ratio(totals, shown)), kind='stable')
+    question_index = {question['id']: i for i, question in enumerate(questions)}
+    choice_presented = presented[:, [question_index[choice['question']] for choice in choices]]
+    upper_rows, lower_rows = ranking[-group_size:], ranking[:group_size]
+    selected = _ratio(selections.sum(axis=0), choice_presented.sum(axis=0))
+    upper = _ratio(selections[upper_rows].sum(axis=0), choice_presented[upper_rows].sum(axis=0))
+    lower = _ratio(selections[lower_rows].sum(axis=0), choice_presented[lower_rows].sum(axis=0))
+
+    items = {question['id']: {
+        'question': question['id'],
+        'content': question['content'],
+        'difficulty': _number(difficulty[i]),
+        'discrimination': _number(discrimination[i]),
+        'choices': [],
+    } for i, question in enumerate(questions)}
+    correct = {question['correct_choice'] for question in questions}
+    for i, choice in enumerate(choices):
+        items[choice['question']]['choices'].append({
+            'choice': choice['id'],
+            'content': choice['content'],
+            'is_correct': choice['id'] in correct,
+            'count': int(selections[:, i].sum()),
+            'proportion': _number(selected[i]),
+            'upper': _number(upper[i]),
+            'lower': _number(lower[i]),
+        })
+
+    return {
+        'submissions': n_submissions,
+        'questions': n_items,
+        'kr20': _number(kr20),
+        'items': list(items.values()),
+    }
+
+
+def get_quiz_analysis(quiz_id):
+    # Keyed on the answers so that new, deleted or cascaded answers all invalidate it
+    fingerprint = tuple(Answer.objects.filter(submission__quiz=quiz_id).aggregate(count=Count('id'), last=Max('id')).values())
+    key = f'quiz:{quiz_id}:item_analysis'
+    cached = cache.get(key)
+    if cached is None or cached['fingerprint'] != fingerprint:
+        cached = {'fingerprint': fingerprint, 'analysis': analyze_quiz(Quiz.objects.get(pk=quiz_id))}
+        cache.set(key, cached, ANALYSIS_TIMEOUT)
+    return cached['analysis']
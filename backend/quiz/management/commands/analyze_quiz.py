@@ -0,0 +1,26 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from quiz.analytics import get_quiz_analysis
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = 'Print item analysis (difficulty, discrimination, distractors, KR-20) for a quiz'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_id')
+
+    def handle(self, *args, **options):
+        try:
+            quiz = Quiz.objects.get(id=options['quiz_id'])
+        except (Quiz.DoesNotExist, ValidationError):
+            raise CommandError(f"Quiz {options['quiz_id']} does not exist")
+
+        analysis = get_quiz_analysis(quiz.id)
+        self.stdout.write(f"{quiz.title}: {analysis['submissions']} submissions, {analysis['questions']} questions, KR-20 {analysis['kr20']}")
+        for item in analysis['items']:
+            self.stdout.write(f"\n[{item['question']}] {item['content']}")
+            self.stdout.write(f"  difficulty {item['difficulty']}, discrimination {item['discrimination']}")
+            for choice in item['choices']:
+                marker = '*' if choice['is_correct'] else ' '
+                self.stdout.write(f"  {marker} {choice['content']}: {choice['count']} ({choice['proportion']}), upper {choice['upper']}, lower {choice['lower']}")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from quiz.models import Question, Quiz, QuizSubmission
+
+
+class Command(BaseCommand):
+    help = 'Rebuild question ordinals for question bank sampling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', help='Quizzes to renumber, all of them by default')
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.all()
+        if options['quiz_ids']:
+            quizzes = quizzes.filter(id__in=options['quiz_ids'])
+
+        for quiz in quizzes:
+            # Renumbering would change the papers already drawn from this bank
+            if QuizSubmission.objects.filter(quiz=quiz, bank_size__isnull=False).exists():
+                self.stdout.write(f'{quiz.title}: skipped, papers have already been drawn')
+                continue
+
+            with transaction.atomic():
+                questions = list(Question.objects.filter(quiz=quiz).order_by('ordinal', 'id'))
+                for ordinal, question in enumerate(questions):
+                    question.ordinal = ordinal
+                Question.objects.bulk_update(questions, ['ordinal'], batch_size=1000)
+                Quiz.objects.filter(pk=quiz.pk).update(next_ordinal=len(questions))
+            self.stdout.write(f'{quiz.title}: {len(questions)} questions')
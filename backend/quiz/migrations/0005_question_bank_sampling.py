@@ -0,0 +1,55 @@
+# Generated by Django 5.1 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+def number_questions(apps, schema_editor):
+    # Give existing questions ordinals in creation order, as renumber_questions does
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Question = apps.get_model('quiz', 'Question')
+    for quiz in Quiz.objects.all():
+        questions = list(Question.objects.filter(quiz=quiz).order_by('id'))
+        for ordinal, question in enumerate(questions):
+            question.ordinal = ordinal
+        Question.objects.bulk_update(questions, ['ordinal'], batch_size=1000)
+        Quiz.objects.filter(pk=quiz.pk).update(next_ordinal=len(questions))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='ordinal',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='next_ordinal',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='sample_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quizsubmission',
+            name='bank_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='quizsubmission',
+            name='sample_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'ordinal'], name='quiz_questi_quiz_id_60722d_idx'),
+        ),
+        migrations.RunPython(number_questions, migrations.RunPython.noop),
+    ]
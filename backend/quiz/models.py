@@ -1,10 +1,17 @@
 import uuid
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from .choices import question_type, quiz_state
 
 
+def clear_item_analysis(quiz_id):
+    # Answers are covered by the analysis fingerprint, edits to the quiz itself are not
+    cache.delete(f'quiz:{quiz_id}:item_analysis')
+
+
 class CustomUser(AbstractUser):
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
@@ -24,20 +31,95 @@ class Quiz(models.Model):
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     start_time = models.DateTimeField(null=True, blank=True)
     duration = models.DurationField(null=True, blank=True)
+    # Number of questions drawn from the bank for each participant, all of them when empty
+    sample_size = models.PositiveIntegerField(null=True, blank=True)
+    # Ordinal given to the next question, ordinals are never reused
+    next_ordinal = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # next_ordinal is only moved by Question.save, a stale instance must not roll it back
+        if not self._state.adding and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'next_ordinal']
+        super().save(*args, **kwargs)
+        clear_item_analysis(self.pk)
+
+    def copy_title(self):
+        suffix = " (copy)"
+        max_length = self._meta.get_field('title').max_length
+        return f"{self.title[:max_length - len(suffix)]}{suffix}"
+
+    @transaction.atomic
+    def clone(self, creator, title=None):
+        # Copies questions and choices with a fixed number of queries, whatever the quiz size
+        quiz = Quiz.objects.create(
+            title=title or self.copy_title(),
+            description=self.description,
+            password=self.password,
+            creator=creator,
+            duration=self.duration,
+            sample_size=self.sample_size,
+            next_ordinal=self.next_ordinal,
+        )
+
+        questions = list(Question.objects.filter(quiz=self).order_by('ordinal', 'id'))
+        choices = list(Choice.objects.filter(question__quiz=self).order_by('id'))
+
+        new_questions = Question.objects.bulk_create([
+            Question(quiz=quiz, content=question.content, type=question.type, ordinal=question.ordinal)
+            for question in questions
+        ])
+        question_map = {old.id: new for old, new in zip(questions, new_questions)}
+
+        new_choices = Choice.objects.bulk_create([
+            Choice(question=question_map[choice.question_id], content=choice.content)
+            for choice in choices
+        ])
+        choice_map = {old.id: new.id for old, new in zip(choices, new_choices)}
+
+        answered = []
+        for question in questions:
+            if question.correct_choice_id in choice_map:
+                new_question = question_map[question.id]
+                new_question.correct_choice_id = choice_map[question.correct_choice_id]
+                answered.append(new_question)
+        Question.objects.bulk_update(answered, ['correct_choice'])
+
+        return quiz
+
 
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, related_name='questions', on_delete=models.CASCADE)
     content = models.TextField()
     type = models.CharField(max_length=9, choices=question_type)
     correct_choice = models.ForeignKey('Choice', on_delete=models.SET_NULL, related_name='correct_choice', null=True, blank=True)
+    # Stable position within the quiz, used to sample questions without scanning the bank
+    ordinal = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['quiz', 'ordinal'])]
 
     def __str__(self):
         return self.content
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            with transaction.atomic():
+                quiz = Quiz.objects.select_for_update().get(pk=self.quiz_id)
+                self.ordinal = quiz.next_ordinal
+                Quiz.objects.filter(pk=quiz.pk).update(next_ordinal=F('next_ordinal') + 1)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        clear_item_analysis(self.quiz_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        clear_item_analysis(self.quiz_id)
+        return result
+
 
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name='choices', on_delete=models.CASCADE)
@@ -46,6 +128,15 @@ class Choice(models.Model):
     def __str__(self):
         return self.content
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        clear_item_analysis(self.question.quiz_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        clear_item_analysis(self.question.quiz_id)
+        return result
+
 
 class QuizSubmission(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False) 
@@ -57,6 +148,9 @@ class QuizSubmission(models.Model):
     finished_at = models.DateTimeField(null=True, blank=True)
     end_at = models.DateTimeField(null=True, blank=True)
     time_spent = models.IntegerField(null=True, blank=True)
+    # Bank size and sample size when the paper was first drawn, so it can be rebuilt later
+    bank_size = models.PositiveIntegerField(null=True, blank=True)
+    sample_size = models.PositiveIntegerField(null=True, blank=True)
 
     score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     score_before_regrade = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
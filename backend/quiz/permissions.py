@@ -1,3 +1,4 @@
+from django.shortcuts import get_object_or_404
 from rest_framework import permissions
 from .models import Quiz, Question
 
@@ -16,10 +17,10 @@ class IsCreator(permissions.BasePermission):
         question_id = view.kwargs.get('question_id')
 
         if quiz_id:
-            quiz = Quiz.objects.get(id=quiz_id)
+            quiz = get_object_or_404(Quiz, id=quiz_id)
             return quiz.creator == request.user
         elif question_id:
-            question = Question.objects.get(id=question_id)
+            question = get_object_or_404(Question, id=question_id)
             return question.quiz.creator == request.user
 
         return True
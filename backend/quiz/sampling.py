@@ -0,0 +1,102 @@
+import logging
+import random
+from itertools import islice
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from .models import Question, Quiz, QuizSubmission
+
+logger = logging.getLogger(__name__)
+
+PAPER_TIMEOUT = 60 * 60 * 24
+
+
+def paper_key(submission_id):
+    return f'submission:{submission_id}:paper'
+
+
+def iter_ordinals(seed, bank_size):
+    # Lazy Fisher-Yates shuffle of range(bank_size): O(1) per ordinal, and each prefix is the same whatever is read after it
+    rng = random.Random(seed)
+    swapped = {}
+    for i in range(bank_size):
+        j = rng.randrange(i, bank_size)
+        ordinal = swapped.get(j, j)
+        swapped[j] = swapped.pop(i, i)
+        yield ordinal
+
+
+def draw_paper(seed, bank_size, sample_size, lookup, lookup_all):
+    """
+    Draw up to sample_size question IDs. lookup maps a list of ordinals to a
+    {ordinal: id} dict, and ordinals of deleted questions are skipped and
+    replaced. Once a batch finds fewer than half of its ordinals, lookup_all
+    loads every live ordinal at once instead of probing a sparse bank batch by
+    batch.
+    """
+    ordinals = iter_ordinals(seed, bank_size)
+    paper = []
+    while len(paper) < sample_size:
+        batch = list(islice(ordinals, sample_size - len(paper)))
+        if not batch:
+            return paper
+        ids = lookup(batch)
+        paper.extend(ids[ordinal] for ordinal in batch if ordinal in ids)
+        if len(ids) * 2 < len(batch):
+            break
+    if len(paper) >= sample_size:
+        return paper
+
+    live = {ordinal: pk for ordinal, pk in lookup_all().items() if ordinal < bank_size}
+    # Every live ordinal read so far is already on the paper, so stop as soon as the rest are found
+    wanted = min(sample_size, len(live))
+    for ordinal in ordinals:
+        if len(paper) >= wanted:
+            break
+        if ordinal in live:
+            paper.append(live[ordinal])
+    return paper
+
+
+def freeze_draw(submission):
+    # Questions added, or sample_size changes made, after the first draw never alter the paper
+    if submission.bank_size is None:
+        quiz = Quiz.objects.filter(pk=OuterRef('quiz'))
+        QuizSubmission.objects.filter(pk=submission.pk, bank_size__isnull=True).update(
+            bank_size=Subquery(quiz.values('next_ordinal')),
+            sample_size=Subquery(quiz.values('sample_size')),
+        )
+        submission.bank_size, submission.sample_size = QuizSubmission.objects.values_list('bank_size', 'sample_size').get(pk=submission.pk)
+    return submission.bank_size, submission.sample_size
+
+
+def is_sampled(submission):
+    return bool(submission.sample_size or submission.quiz.sample_size)
+
+
+def get_paper(submission):
+    """
+    Return the question IDs drawn for a submission, in the order they are shown.
+    """
+    key = paper_key(submission.id)
+    paper = cache.get(key)
+    if paper is None:
+        bank_size, sample_size = freeze_draw(submission)
+        questions = Question.objects.filter(quiz=submission.quiz_id)
+
+        def lookup(ordinals):
+            return dict(questions.filter(ordinal__in=ordinals).values_list('ordinal', 'id'))
+
+        def lookup_all():
+            return dict(questions.filter(ordinal__lt=bank_size).values_list('ordinal', 'id'))
+
+        paper = draw_paper(submission.id.int, bank_size, sample_size, lookup, lookup_all)
+        if len(paper) < sample_size:
+            logger.warning('Quiz %s has %d questions, fewer than its sample size of %d', submission.quiz_id, len(paper), sample_size)
+        cache.set(key, paper, PAPER_TIMEOUT)
+    return paper
+
+
+def get_paper_questions(submission):
+    paper = get_paper(submission)
+    questions = Question.objects.in_bulk(paper)
+    return [questions[pk] for pk in paper if pk in questions]
@@ -65,7 +65,7 @@ class QuizSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Quiz
-        fields = ['id', 'title', 'description', 'password', 'creator', 'start_time', 'duration', 'questions']
+        fields = ['id', 'title', 'description', 'password', 'creator', 'start_time', 'duration', 'sample_size', 'questions']
         read_only_fields = ['creator']
 
     def create(self, validated_data):
@@ -82,6 +82,13 @@ class QuizSerializer(serializers.ModelSerializer):
     #         raise serializers.ValidationError("Invalid date format")
     #     return parsed_time
 
+class QuizCloneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Quiz
+        fields = ['title']
+        extra_kwargs = {'title': {'required': False}}
+
+
 class QuizListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quiz
@@ -112,4 +119,4 @@ class AnswerSerializer(serializers.ModelSerializer):
 class QuizQuestionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Question
-        exclude = ['correct_choice']
\ No newline at end of file
+        exclude = ['correct_choice', 'ordinal']
\ No newline at end of file
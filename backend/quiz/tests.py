@@ -1,3 +1,455 @@
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from .admission import CacheAdmissionQueue, LocalAdmissionQueue, get_admission_queue
+from .analytics import get_quiz_analysis
+from .models import Answer, Choice, CustomUser, Question, Quiz, QuizSubmission
+from .sampling import get_paper
 
-# Create your tests here.
+
+def create_user(name):
+    return CustomUser.objects.create_user(email=f'{name}@example.com', username=name, name=name, password='password')
+
+
+class LocalAdmissionQueueTests(TestCase):
+    backend = LocalAdmissionQueue
+
+    def setUp(self):
+        cache.clear()
+        self.queue = self.backend(rate=20, burst=50, window=900)
+
+    def admit_at(self, now, submission_id, quiz_id='quiz'):
+        with mock.patch('quiz.admission.time.time', return_value=now):
+            return self.queue.admit(quiz_id, submission_id)
+
+    def test_burst_is_admitted_then_queued_in_order(self):
+        results = [self.admit_at(1000, i) for i in range(60)]
+        self.assertTrue(all(result.admitted for result in results[:50]))
+        self.assertEqual([result.position for result in results[50:]], list(range(1, 11)))
+        self.assertEqual(results[50].retry_after, 1)
+        self.assertEqual(results[59].retry_after, 1)
+        self.assertEqual(self.admit_at(1000, 'late').retry_after, 1)
+        self.assertEqual(self.admit_at(1000, 'later', 'other').position, 0)
+
+    def test_retry_after_grows_with_position(self):
+        for i in range(250):
+            result = self.admit_at(1000, i)
+        self.assertEqual(result.position, 200)
+        self.assertEqual(result.retry_after, 10)
+
+    def test_queued_submission_is_admitted_at_its_slot(self):
+        for i in range(51):
+            self.admit_at(1000, i)
+        self.assertFalse(self.admit_at(1000, 50).admitted)
+        self.assertTrue(self.admit_at(1000.05, 50).admitted)
+
+    def test_early_caller_does_not_open_the_gate(self):
+        self.admit_at(1000, 'early')
+        results = [self.admit_at(1060, i) for i in range(1200)]
+        self.assertEqual(sum(result.admitted for result in results), 50)
+        self.assertEqual(results[-1].position, 1150)
+
+    def test_idle_queue_refills_up_to_burst(self):
+        for i in range(100):
+            self.admit_at(1000, i)
+        results = [self.admit_at(1000 + 2000, f'next-{i}') for i in range(60)]
+        self.assertEqual(sum(result.admitted for result in results), 50)
+
+    def test_waiting_submission_keeps_its_place_after_the_window(self):
+        self.queue = self.backend(rate=1, burst=1, window=5)
+        for i in range(20):
+            self.admit_at(1000, i)
+        waiting = self.admit_at(1010, 19)
+        newcomer = self.admit_at(1010, 'newcomer')
+        self.assertFalse(waiting.admitted)
+        self.assertGreater(newcomer.position, waiting.position)
+
+
+class CacheAdmissionQueueTests(LocalAdmissionQueueTests):
+    backend = CacheAdmissionQueue
+
+    def test_busy_lock_backs_off_with_retry(self):
+        cache.add('quiz:quiz:admission:lock', 'other', 60)
+        with mock.patch('quiz.admission.LOCK_WAIT', 0.01):
+            result = self.admit_at(1000, 'blocked')
+        self.assertEqual((result.admitted, result.position, result.retry_after), (False, None, 1))
+
+    def test_lock_is_only_released_by_its_owner(self):
+        with self.queue.lock('lock'):
+            cache.set('lock', 'other')
+        self.assertEqual(cache.get('lock'), 'other')
+        with self.queue.lock('free'):
+            pass
+        self.assertIsNone(cache.get('free'))
+
+
+class LocalAdmissionEvictionTests(TestCase):
+    def test_expired_quizzes_are_dropped(self):
+        queue = LocalAdmissionQueue(rate=20, burst=50, window=900)
+        with mock.patch('quiz.admission.time.time', return_value=1000):
+            for i in range(10):
+                queue.admit('old', i)
+        with mock.patch('quiz.admission.time.time', return_value=1000 + 901):
+            queue.admit('new', 0)
+        self.assertEqual(list(queue._buckets), ['new'])
+
+
+class AdmissionViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_admission_queue.cache_clear()
+        self.addCleanup(get_admission_queue.cache_clear)
+        creator = create_user('creator')
+        self.quiz = Quiz.objects.create(title='Quiz', creator=creator, duration=timedelta(minutes=30))
+        Question.objects.create(quiz=self.quiz, content='Question', type='mcq')
+
+    def join(self, name):
+        user = create_user(name)
+        client = APIClient()
+        client.force_authenticate(user)
+        return client, QuizSubmission.objects.create(quiz=self.quiz, user=user)
+
+    def test_queued_participants_get_429_with_retry_after(self):
+        with self.settings(QUIZ_ADMISSION={'RATE': 1, 'BURST': 1}), mock.patch('quiz.admission.time.time', return_value=1000):
+            first, first_submission = self.join('first')
+            second, second_submission = self.join('second')
+
+            response = first.post(f'/api/v1/quiz/{self.quiz.id}/submit/{first_submission.id}/start/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = second.post(f'/api/v1/quiz/{self.quiz.id}/submit/{second_submission.id}/start/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response.data['position'], 1)
+            self.assertEqual(response['Retry-After'], str(response.data['retry_after']))
+            second_submission.refresh_from_db()
+            self.assertIsNone(second_submission.started_at)
+
+            response = second.get(f'/api/v1/quiz/{self.quiz.id}/submit/{second_submission.id}/questions/')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_end_at_is_counted_from_admission(self):
+        client, submission = self.join('participant')
+        response = client.post(f'/api/v1/quiz/{self.quiz.id}/submit/{submission.id}/start/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        submission.refresh_from_db()
+        self.assertEqual(submission.end_at - submission.started_at, self.quiz.duration)
+
+        response = client.get(f'/api/v1/quiz/{self.quiz.id}/submit/{submission.id}/questions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class QuestionSamplingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.creator = create_user('creator')
+        self.quiz = Quiz.objects.create(title='Bank', creator=self.creator, duration=timedelta(minutes=30), sample_size=5)
+        for i in range(30):
+            Question.objects.create(quiz=self.quiz, content=f'Question {i}', type='mcq')
+        self.user = create_user('participant')
+        self.submission = QuizSubmission.objects.create(quiz=self.quiz, user=self.user)
+
+    def fresh_paper(self):
+        cache.clear()
+        return get_paper(QuizSubmission.objects.get(pk=self.submission.pk))
+
+    def test_ordinals_are_never_reused(self):
+        questions = list(Question.objects.filter(quiz=self.quiz).order_by('ordinal'))
+        self.assertEqual([question.ordinal for question in questions], list(range(30)))
+        questions[-1].delete()
+        questions[3].delete()
+        question = Question.objects.create(quiz=self.quiz, content='New', type='mcq')
+        self.assertEqual(question.ordinal, 30)
+        self.assertEqual(Question.objects.get(pk=questions[10].pk).ordinal, 10)
+
+    def test_paper_is_deterministic_and_respects_sample_size(self):
+        paper = get_paper(self.submission)
+        self.assertEqual(len(paper), 5)
+        self.assertEqual(len(set(paper)), 5)
+        self.assertEqual(self.fresh_paper(), paper)
+
+        other = QuizSubmission.objects.create(quiz=self.quiz, user=create_user('other'))
+        self.assertNotEqual(get_paper(other), paper)
+
+    def test_paper_survives_bank_changes(self):
+        paper = get_paper(self.submission)
+        for i in range(10):
+            Question.objects.create(quiz=self.quiz, content=f'Added {i}', type='mcq')
+        Question.objects.exclude(pk__in=paper).filter(quiz=self.quiz).first().delete()
+        self.assertEqual(self.fresh_paper(), paper)
+
+    def test_deleted_question_is_replaced(self):
+        paper = get_paper(self.submission)
+        Question.objects.filter(pk=paper[0]).delete()
+        new_paper = self.fresh_paper()
+        self.assertEqual(len(new_paper), 5)
+        self.assertEqual(new_paper[:4], paper[1:])
+
+    def test_sample_size_is_frozen_with_the_paper(self):
+        paper = get_paper(self.submission)
+        self.quiz.sample_size = 2
+        self.quiz.save()
+        self.assertEqual(self.fresh_paper(), paper)
+
+        other = QuizSubmission.objects.create(quiz=self.quiz, user=create_user('other'))
+        self.assertEqual(len(get_paper(other)), 2)
+
+    def test_sparse_bank_uses_a_bounded_number_of_queries(self):
+        quiz = Quiz.objects.create(title='Sparse', creator=self.creator, sample_size=20)
+        for i in range(10):
+            Question.objects.create(quiz=quiz, content=f'Question {i}', type='mcq')
+        # Ten live questions spread over an ordinal range of 100,000
+        for question in Question.objects.filter(quiz=quiz):
+            Question.objects.filter(pk=question.pk).update(ordinal=question.ordinal * 9973)
+        Quiz.objects.filter(pk=quiz.pk).update(next_ordinal=100000)
+        submission = QuizSubmission.objects.create(quiz=quiz, user=self.user)
+
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('quiz.sampling', 'WARNING'):
+            paper = get_paper(QuizSubmission.objects.get(pk=submission.pk))
+        self.assertEqual(sorted(paper), sorted(Question.objects.filter(quiz=quiz).values_list('id', flat=True)))
+        self.assertLessEqual(len(queries), 5)
+        cache.clear()
+        self.assertEqual(get_paper(QuizSubmission.objects.get(pk=submission.pk)), paper)
+
+    def test_small_bank_is_logged(self):
+        self.quiz.sample_size = 50
+        self.quiz.save()
+        with self.assertLogs('quiz.sampling', 'WARNING'):
+            self.assertEqual(len(self.fresh_paper()), 30)
+
+    def test_questions_and_answers_follow_the_paper(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(f'/api/v1/quiz/{self.quiz.id}/submit/{self.submission.id}/questions/')
+        paper = [question['id'] for question in response.data['questions']]
+        self.assertEqual(paper, get_paper(self.submission))
+
+        outside = Question.objects.filter(quiz=self.quiz).exclude(pk__in=paper).first()
+        choice = Choice.objects.create(question=outside, content='Choice')
+        response = client.post(f'/api/v1/quiz/{self.quiz.id}/submit/{self.submission.id}/', {'question': outside.id, 'choice': choice.id})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        inside = Question.objects.get(pk=paper[0])
+        choice = Choice.objects.create(question=inside, content='Choice')
+        inside.correct_choice = choice
+        inside.save()
+        response = client.post(f'/api/v1/quiz/{self.quiz.id}/submit/{self.submission.id}/', {'question': inside.id, 'choice': choice.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ItemAnalysisTests(TestCase):
+    # Rows are submissions, columns are questions, 1 is a correct answer
+    RESPONSES = [
+        [1, 1, 1],
+        [1, 1, 0],
+        [1, 0, 0],
+        [0, 0, 0],
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.creator = create_user('creator')
+        self.quiz = Quiz.objects.create(title='Analysis', creator=self.creator, duration=timedelta(minutes=30))
+
+    def add_question(self, quiz, content):
+        question = Question.objects.create(quiz=quiz, content=content, type='mcq')
+        right = Choice.objects.create(question=question, content='Right')
+        wrong = Choice.objects.create(question=question, content='Wrong')
+        question.correct_choice = right
+        question.save()
+        return question, right, wrong
+
+    def answer(self, submission, question, right, wrong, correct):
+        Answer.objects.create(submission=submission, question=question, choice=right if correct else wrong, is_correct=bool(correct))
+
+    def take_quiz(self):
+        questions = [self.add_question(self.quiz, f'Question {i}') for i in range(3)]
+        submissions = []
+        for i, row in enumerate(self.RESPONSES):
+            submission = QuizSubmission.objects.create(quiz=self.quiz, user=create_user(f'participant{i}'))
+            for correct, (question, right, wrong) in zip(row, questions):
+                self.answer(submission, question, right, wrong, correct)
+            submissions.append(submission)
+        return submissions
+
+    def test_statistics_match_hand_computed_values(self):
+        self.take_quiz()
+        analysis = get_quiz_analysis(self.quiz.id)
+        self.assertEqual(analysis['submissions'], 4)
+        self.assertEqual(analysis['kr20'], 0.75)
+        self.assertEqual([item['difficulty'] for item in analysis['items']], [0.75, 0.5, 0.25])
+        self.assertEqual([item['discrimination'] for item in analysis['items']], [0.5222, 0.7071, 0.5222])
+
+        right, wrong = analysis['items'][0]['choices']
+        self.assertEqual((right['is_correct'], right['count'], right['proportion'], right['upper'], right['lower']), (True, 3, 0.75, 1.0, 0.0))
+        self.assertEqual((wrong['is_correct'], wrong['count'], wrong['proportion'], wrong['upper'], wrong['lower']), (False, 1, 0.25, 0.0, 1.0))
+
+    def test_empty_quiz(self):
+        self.assertEqual(get_quiz_analysis(self.quiz.id), {'submissions': 0, 'questions': 0, 'kr20': None, 'items': []})
+        self.add_question(self.quiz, 'Unanswered')
+        item = get_quiz_analysis(self.quiz.id)['items'][0]
+        self.assertIsNone(item['difficulty'])
+        self.assertIsNone(item['discrimination'])
+
+    def test_sampled_quiz_only_scores_presented_questions(self):
+        self.quiz.sample_size = 2
+        self.quiz.save()
+        questions = {question.id: (question, right, wrong) for question, right, wrong in (self.add_question(self.quiz, f'Question {i}') for i in range(6))}
+        for i in range(8):
+            submission = QuizSubmission.objects.create(quiz=self.quiz, user=create_user(f'participant{i}'))
+            for pk in get_paper(submission):
+                self.answer(submission, *questions[pk], correct=True)
+
+        analysis = get_quiz_analysis(self.quiz.id)
+        self.assertIsNone(analysis['kr20'])
+        for item in analysis['items']:
+            self.assertIn(item['difficulty'], (1.0, None))
+            right = item['choices'][0]
+            self.assertIn(right['proportion'], (1.0, None))
+
+    def test_cached_papers_are_used_over_a_rebuild(self):
+        self.quiz.sample_size = 2
+        self.quiz.save()
+        questions = {question.id: (question, right, wrong) for question, right, wrong in (self.add_question(self.quiz, f'Question {i}') for i in range(6))}
+        submission = QuizSubmission.objects.create(quiz=self.quiz, user=create_user('participant'))
+        answered, skipped = get_paper(submission)
+        self.answer(submission, *questions[answered], correct=True)
+        Question.objects.get(pk=skipped).delete()
+
+        difficulty = {item['question']: item['difficulty'] for item in get_quiz_analysis(self.quiz.id)['items']}
+        self.assertEqual([pk for pk, value in difficulty.items() if value is not None], [answered])
+
+        # Once the paper has left the cache it is drawn again, and the deleted question is replaced
+        cache.clear()
+        difficulty = {item['question']: item['difficulty'] for item in get_quiz_analysis(self.quiz.id)['items']}
+        replacement = [pk for pk, value in difficulty.items() if value == 0.0]
+        self.assertEqual(len(replacement), 1)
+        self.assertNotIn(replacement[0], (answered, skipped))
+
+    def test_frozen_sample_size_outlives_the_quiz_setting(self):
+        self.quiz.sample_size = 2
+        self.quiz.save()
+        questions = {question.id: (question, right, wrong) for question, right, wrong in (self.add_question(self.quiz, f'Question {i}') for i in range(6))}
+        for i in range(8):
+            submission = QuizSubmission.objects.create(quiz=self.quiz, user=create_user(f'participant{i}'))
+            for pk in get_paper(submission):
+                self.answer(submission, *questions[pk], correct=True)
+        self.quiz.sample_size = None
+        self.quiz.save()
+        cache.clear()
+
+        # Ordinals are loaded once for all rebuilt papers
+        with CaptureQueriesContext(connection) as queries:
+            analysis = get_quiz_analysis(self.quiz.id)
+        self.assertLessEqual(len(queries), 7)
+        self.assertIsNone(analysis['kr20'])
+        for item in analysis['items']:
+            self.assertIn(item['difficulty'], (1.0, None))
+
+    def test_cache_follows_answers_and_edits(self):
+        submissions = self.take_quiz()
+        self.assertEqual(get_quiz_analysis(self.quiz.id)['submissions'], 4)
+
+        submissions[0].delete()
+        self.assertEqual(get_quiz_analysis(self.quiz.id)['submissions'], 3)
+
+        question = Question.objects.filter(quiz=self.quiz).first()
+        question.content = 'Edited'
+        question.save()
+        self.assertEqual(get_quiz_analysis(self.quiz.id)['items'][0]['content'], 'Edited')
+
+    def test_analysis_is_creator_only(self):
+        self.take_quiz()
+        client = APIClient()
+        client.force_authenticate(self.creator)
+        response = client.get(f'/api/v1/quiz/{self.quiz.id}/analysis/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['kr20'], 0.75)
+
+        client.force_authenticate(create_user('stranger'))
+        response = client.get(f'/api/v1/quiz/{self.quiz.id}/analysis/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command_rejects_unknown_quizzes(self):
+        for quiz_id in ('not-a-uuid', '00000000-0000-0000-0000-000000000000'):
+            with self.assertRaises(CommandError):
+                call_command('analyze_quiz', quiz_id)
+
+
+class QuizCloneTests(TestCase):
+    def setUp(self):
+        self.creator = create_user('creator')
+        self.client = APIClient()
+        self.client.force_authenticate(self.creator)
+
+    def create_quiz(self, size, title='Quiz'):
+        quiz = Quiz.objects.create(title=title, creator=self.creator, duration=timedelta(minutes=30), sample_size=3)
+        for i in range(size):
+            question = Question.objects.create(quiz=quiz, content=f'Question {i}', type='mcq')
+            choices = [Choice.objects.create(question=question, content=f'Choice {i}.{j}') for j in range(4)]
+            if i % 5:
+                question.correct_choice = choices[i % 4]
+                question.save()
+        return quiz
+
+    def snapshot(self, quiz):
+        return [
+            (question.content, question.ordinal, question.correct_choice and question.correct_choice.content, [choice.content for choice in question.choices.order_by('id')])
+            for question in Question.objects.filter(quiz=quiz).order_by('ordinal').select_related('correct_choice')
+        ]
+
+    def clone(self, quiz, data=None):
+        return self.client.post(f'/api/v1/quiz/{quiz.id}/clone/', data or {})
+
+    def test_clone_remaps_correct_choice(self):
+        quiz = self.create_quiz(12)
+        original = self.snapshot(quiz)
+        original_ids = set(Question.objects.filter(quiz=quiz).values_list('id', flat=True))
+
+        response = self.clone(quiz, {'title': 'Next term'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        clone = Quiz.objects.get(id=response.data['id'])
+        self.assertEqual(clone.title, 'Next term')
+        self.assertEqual((clone.sample_size, clone.next_ordinal), (3, 12))
+
+        for question in Question.objects.filter(quiz=clone).select_related('correct_choice'):
+            self.assertNotIn(question.id, original_ids)
+            if question.correct_choice:
+                self.assertEqual(question.correct_choice.question_id, question.id)
+        self.assertEqual(self.snapshot(clone), original)
+        self.assertEqual(self.snapshot(quiz), original)
+        self.assertEqual(Question.objects.filter(quiz=quiz).count(), 12)
+
+    def test_query_count_does_not_grow_with_quiz_size(self):
+        small, large = self.create_quiz(5), self.create_quiz(50)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.clone(small)
+        with CaptureQueriesContext(connection) as large_queries:
+            self.clone(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_title_is_validated(self):
+        quiz = self.create_quiz(1, title='x' * 255)
+        response = self.clone(quiz, {'title': 'y' * 256})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.clone(quiz)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['title']), 255)
+        self.assertTrue(response.data['title'].endswith(' (copy)'))
+
+    def test_unknown_or_foreign_quiz(self):
+        response = self.client.post('/api/v1/quiz/00000000-0000-0000-0000-000000000000/clone/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/v1/quiz/00000000-0000-0000-0000-000000000000/analysis/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(create_user('stranger'))
+        response = self.clone(self.create_quiz(1))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
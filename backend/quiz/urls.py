@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ChoiceDetailsView, ChoiceView, CreatedQuizzesView, JoinQuizView, QuestionDetailsView, QuestionView, QuizCreateView, QuizDetailView, QuizQuestions, RegisterView, CustomTokenObtainPairView, QuizSubmissionView, StartSubmissionSessionView, TakenQuizzesView, UserProfileView, QuizSubmissionGetView
+from .views import ChoiceDetailsView, ChoiceView, CreatedQuizzesView, JoinQuizView, QuestionDetailsView, QuestionView, QuizCreateView, QuizDetailView, QuizAnalysisView, QuizCloneView, QuizQuestions, RegisterView, CustomTokenObtainPairView, QuizSubmissionView, StartSubmissionSessionView, TakenQuizzesView, UserProfileView, QuizSubmissionGetView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
@@ -9,6 +9,7 @@ urlpatterns = [
     
     path('quiz/create/', QuizCreateView.as_view(), name='quiz-create'),
     path('quiz/<uuid:pk>/', QuizDetailView.as_view(), name='quiz-detail'),
+    path('quiz/<uuid:quiz_id>/clone/', QuizCloneView.as_view(), name='quiz-clone'),
 
     path('quiz/<uuid:quiz_id>/question/', QuestionView.as_view(), name='question-list-create'),
     path('quiz/<uuid:quiz_id>/question/<int:pk>/', QuestionDetailsView.as_view(), name='question-detail'),
@@ -20,6 +21,7 @@ urlpatterns = [
     path('quiz/<uuid:quiz_id>/submit/<uuid:submission_id>/start/', StartSubmissionSessionView.as_view(), name='start-submission-session'),
     path('quiz/<uuid:quiz_id>/submit/<uuid:submission_id>/questions/', QuizQuestions.as_view(), name='show-quiz-question'),
     path('quiz/<uuid:quiz_id>/submit/<uuid:submission_id>/', QuizSubmissionView.as_view(), name='submit-answer'),
+    path('quiz/<uuid:quiz_id>/analysis/', QuizAnalysisView.as_view(), name='quiz-analysis'),
     
     path('quiz/created/', CreatedQuizzesView.as_view(), name='created-quizzes'),
     path('quiz/taken/', TakenQuizzesView.as_view(), name='taken-quizzes'),
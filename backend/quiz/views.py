@@ -1,12 +1,23 @@
-from datetime import datetime
 from django.http import JsonResponse
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import Answer, Choice, CustomUser, Question, Quiz, QuizSubmission
-from .serializers import AnswerSerializer, ChoiceSerializer, QuestionSerializer, QuizListSerializer, QuizQuestionSerializer, RegisterSerializer, CustomTokenObtainPairSerializer, QuizSubmissionSerializer, UserSerializer, QuizSerializer
+from .serializers import AnswerSerializer, ChoiceSerializer, QuestionSerializer, QuizCloneSerializer, QuizListSerializer, QuizQuestionSerializer, RegisterSerializer, CustomTokenObtainPairSerializer, QuizSubmissionSerializer, UserSerializer, QuizSerializer
 from .permissions import IsCreator
+from .admission import get_admission_queue
+from .sampling import get_paper, get_paper_questions, is_sampled
+from .analytics import get_quiz_analysis
+
+
+def queued_response(admission):
+    return Response({
+        'message': 'Quiz is busy, you are in the waiting room',
+        'position': admission.position,
+        'retry_after': admission.retry_after,
+    }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(admission.retry_after)})
 
 
 class RegisterView(generics.CreateAPIView):
@@ -144,7 +155,12 @@ class StartSubmissionSessionView(APIView):
             if submission.started_at:
                 return Response({'error': 'You already started this quiz'}, status=status.HTTP_400_BAD_REQUEST)
 
-            submission.started_at = datetime.now()
+            admission = get_admission_queue().admit(quiz_id, submission.id)
+            if not admission.admitted:
+                return queued_response(admission)
+
+            # The clock starts at admission, so time spent in the waiting room is not lost
+            submission.started_at = timezone.now()
             submission.end_at = submission.started_at + submission.quiz.duration
             submission.save()
 
@@ -162,7 +178,15 @@ class QuizQuestions(APIView):
         except QuizSubmission.DoesNotExist:
             return Response({'error': 'You have not joined this quiz or invalid link.'}, status=status.HTTP_404_NOT_FOUND)
 
-        questions = Question.objects.filter(quiz=quiz_id)
+        if not submission.started_at:
+            admission = get_admission_queue().admit(quiz_id, submission.id)
+            if not admission.admitted:
+                return queued_response(admission)
+
+        if is_sampled(submission):
+            questions = get_paper_questions(submission)
+        else:
+            questions = Question.objects.filter(quiz=quiz_id)
         serializer = QuizQuestionSerializer(questions, many=True)
         return Response({'questions': serializer.data}, status=status.HTTP_200_OK)
 
@@ -181,6 +205,9 @@ class QuizSubmissionView(APIView):
             question = Question.objects.get(id=request.data.get('question'), quiz=quiz_id)
         except Question.DoesNotExist:
             return Response({'error': 'Question not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if is_sampled(submission) and question.id not in get_paper(submission):
+            return Response({'error': 'Question not found'}, status=status.HTTP_404_NOT_FOUND)
         
         try:
             choice = Choice.objects.get(id=request.data.get('choice'), question=question)
@@ -213,6 +240,28 @@ class QuizSubmissionView(APIView):
 
 
 
+class QuizCloneView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCreator]
+
+    def post(self, request, quiz_id):
+        try:
+            quiz = Quiz.objects.get(id=quiz_id, creator=request.user)
+        except Quiz.DoesNotExist:
+            return Response({'error': 'Quiz not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        serializer = QuizCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        clone = quiz.clone(request.user, title=serializer.validated_data.get('title'))
+        return Response(QuizListSerializer(clone).data, status=status.HTTP_201_CREATED)
+
+
+class QuizAnalysisView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCreator]
+
+    def get(self, request, quiz_id):
+        return Response(get_quiz_analysis(quiz_id), status=status.HTTP_200_OK)
+
+
 class CreatedQuizzesView(generics.ListAPIView):
     serializer_class = QuizListSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -148,3 +148,12 @@ SIMPLE_JWT = {
 
 # Custom Configuration
 AUTH_USER_MODEL = 'quiz.CustomUser'
+
+# Admission control for quiz start (admissions per second per quiz, burst size, seconds an idle queue is kept).
+# Use 'quiz.admission.CacheAdmissionQueue' with a shared cache when running multiple workers.
+QUIZ_ADMISSION = {
+    'BACKEND': 'quiz.admission.LocalAdmissionQueue',
+    'RATE': 20,
+    'BURST': 50,
+    'WINDOW': 900,
+}